@@ -0,0 +1,144 @@
+# agent/budget.py
+
+import hashlib
+import time
+from typing import Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from pydantic import BaseModel, Field
+
+from .tools import PROJECT_ROOT, iter_project_files
+
+
+def hash_project_files(root=PROJECT_ROOT) -> str:
+  """Returns a digest of every source file (path and content) under the project root."""
+  digest = hashlib.sha256()
+  if not root.exists():
+    return digest.hexdigest()
+  for p in iter_project_files(root):
+    digest.update(str(p.relative_to(root)).encode("utf-8"))
+    digest.update(p.read_bytes())
+  return digest.hexdigest()
+
+
+def hash_text(text: str) -> str:
+  normalized = " ".join(text.split()).lower()
+  return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class BudgetLimits(BaseModel):
+  max_wall_time_s: Optional[float] = Field(900, description="Maximum wall time for a run in seconds, None for no limit")
+  max_tokens: Optional[int] = Field(500_000, description="Maximum total (input + output) LLM tokens, None for no limit")
+  max_cost_usd: Optional[float] = Field(None, description="Maximum estimated LLM cost in USD, None for no limit")
+  input_cost_per_mtok: float = Field(0.15, description="Price in USD per million input tokens, used for cost estimation")
+  output_cost_per_mtok: float = Field(0.75, description="Price in USD per million output tokens, used for cost estimation")
+  max_coder_retries_per_step: int = Field(3, description="Maximum coder retries on the same implementation step")
+  max_debugger_errors: int = Field(3, description="Maximum consecutive debugger tool errors")
+  max_debug_cycles: int = Field(5, description="Maximum number of BUGS_FOUND -> coder fix rounds")
+  max_stalled_iterations: int = Field(2, description="Stop after this many debug cycles in a row without progress")
+
+
+class Budget(BaseModel):
+  limits: BudgetLimits = Field(default_factory=BudgetLimits, description="The limits this run is held to")
+  started_at: Optional[float] = Field(None, description="time.monotonic() when the run started")
+  input_tokens: int = Field(0, description="LLM input tokens consumed so far")
+  output_tokens: int = Field(0, description="LLM output tokens consumed so far")
+  coder_retries: dict[int, int] = Field(default_factory=dict, description="Coder retry count per current_step_idx of the current task plan")
+  debugger_errors: int = Field(0, description="Consecutive debugger tool errors")
+  debug_cycles: int = Field(0, description="Number of debug rounds that found bugs")
+  stalled_iterations: int = Field(0, description="Consecutive debug rounds without progress")
+  last_bug_report_hash: Optional[str] = Field(None, description="Hash of the previous bug report")
+  last_files_hash: Optional[str] = Field(None, description="Hash of the project files at the previous debug round")
+  stop_reason: Optional[str] = Field(None, description="Why the run was stopped early, if it was")
+
+  def start(self) -> "Budget":
+    if self.started_at is None:
+      self.started_at = time.monotonic()
+    return self
+
+  @property
+  def elapsed_s(self) -> float:
+    return 0.0 if self.started_at is None else time.monotonic() - self.started_at
+
+  @property
+  def total_tokens(self) -> int:
+    return self.input_tokens + self.output_tokens
+
+  @property
+  def cost_usd(self) -> float:
+    return (self.input_tokens * self.limits.input_cost_per_mtok
+            + self.output_tokens * self.limits.output_cost_per_mtok) / 1_000_000
+
+  def _stop(self, reason: str) -> str:
+    self.stop_reason = reason
+    return reason
+
+  def record_usage(self, messages: list) -> None:
+    """Adds the token usage reported on LLM response messages."""
+    for msg in messages:
+      usage = getattr(msg, "usage_metadata", None)
+      if usage:
+        self.input_tokens += usage.get("input_tokens", 0)
+        self.output_tokens += usage.get("output_tokens", 0)
+
+  def check(self) -> Optional[str]:
+    """Returns a stop reason if the wall time, token or cost limit is exhausted."""
+    limits = self.limits
+    if self.stop_reason:
+      return self.stop_reason
+    if limits.max_wall_time_s is not None and self.elapsed_s > limits.max_wall_time_s:
+      return self._stop(f"wall time limit of {limits.max_wall_time_s}s exceeded")
+    if limits.max_tokens is not None and self.total_tokens > limits.max_tokens:
+      return self._stop(f"token limit of {limits.max_tokens} exceeded ({self.total_tokens} used)")
+    if limits.max_cost_usd is not None and self.cost_usd > limits.max_cost_usd:
+      return self._stop(f"cost limit of ${limits.max_cost_usd:.2f} exceeded (${self.cost_usd:.2f} spent)")
+    return None
+
+  def record_coder_retry(self, step_idx: int) -> Optional[str]:
+    self.coder_retries[step_idx] = self.coder_retries.get(step_idx, 0) + 1
+    if self.coder_retries[step_idx] > self.limits.max_coder_retries_per_step:
+      return self._stop(
+        f"coder retried step {step_idx} more than {self.limits.max_coder_retries_per_step} times"
+      )
+    return self.check()
+
+  def record_debugger_error(self) -> Optional[str]:
+    self.debugger_errors += 1
+    if self.debugger_errors > self.limits.max_debugger_errors:
+      return self._stop(f"debugger failed more than {self.limits.max_debugger_errors} times in a row")
+    return self.check()
+
+  def record_debug_cycle(self, bug_report: str) -> Optional[str]:
+    """Records a BUGS_FOUND round and stops the run if fixes are not converging."""
+    self.debugger_errors = 0
+    self.debug_cycles += 1
+    # The fix plan restarts at step 0, so retry counts from the previous plan no longer apply
+    self.coder_retries.clear()
+    report_hash = hash_text(bug_report)
+    files_hash = hash_project_files()
+    if report_hash == self.last_bug_report_hash or files_hash == self.last_files_hash:
+      self.stalled_iterations += 1
+    else:
+      self.stalled_iterations = 0
+    self.last_bug_report_hash = report_hash
+    self.last_files_hash = files_hash
+
+    if self.debug_cycles > self.limits.max_debug_cycles:
+      return self._stop(f"more than {self.limits.max_debug_cycles} debug cycles without approval")
+    if self.stalled_iterations >= self.limits.max_stalled_iterations:
+      return self._stop(
+        f"no progress for {self.stalled_iterations} debug cycles (identical bug report or unchanged files)"
+      )
+    return self.check()
+
+
+class BudgetCallbackHandler(BaseCallbackHandler):
+  """Adds the token usage of every LLM call to a Budget, including calls made by runs that later fail or are retried."""
+
+  def __init__(self, budget: Budget):
+    super().__init__()
+    self.budget = budget
+
+  def on_llm_end(self, response, **kwargs) -> None:
+    for generations in response.generations:
+      self.budget.record_usage([getattr(g, "message", None) for g in generations])
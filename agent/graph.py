@@ -3,11 +3,12 @@ from typing import TypedDict, Optional
 from dotenv import load_dotenv
 from langchain_core.globals import set_verbose, set_debug
 from langchain_groq.chat_models import ChatGroq
-from langchain_core.messages import HumanMessage, SystemMessage
 from langgraph.graph import StateGraph, END
 from langgraph.prebuilt import create_react_agent
 
+from .budget import Budget
 from .prompt import *
+from .prompt_cache import PromptAssembler
 from .states import *
 from .tools import *
 from .utility import *
@@ -46,6 +47,21 @@ class AgentState(TypedDict):
     status: Optional[str]
     last_output: Optional[str]
     last_error: Optional[str]  # <-- NEW: For self-correction
+    budget: Optional[Budget]  # Wall time / token / cost limits and loop caps
+    prompts: Optional[PromptAssembler]  # Per-run prompt assembly and prefix-hit statistics
+
+def _prompts(new_state: dict) -> PromptAssembler:
+    """Returns this run's prompt assembler, creating it on first use."""
+    prompts = new_state.get("prompts") or PromptAssembler()
+    new_state["prompts"] = prompts
+    return prompts
+
+def _stop_early(new_state: dict, budget: Budget) -> AgentState:
+    """Ends the run with whatever has been produced so far."""
+    print(f"\n[Budget]: Stopping early - {budget.stop_reason}")
+    new_state["status"] = "BUDGET_EXCEEDED"
+    new_state["last_output"] = f"Stopped early: {budget.stop_reason}"
+    return new_state
 
 # === Define Graph Nodes ===
 
@@ -55,10 +71,19 @@ def planner_agent(state: AgentState) -> AgentState:
     user_prompt = new_state.get("user_prompt")
     if not user_prompt:
         raise ValueError("planner_agent expects 'user_prompt' in state.")
-    resp = invoke_structured(llm, Plan, planner_prompt(user_prompt))
+    budget = (new_state.get("budget") or Budget()).start()
+    new_state["budget"] = budget
+    if budget.check():
+        return _stop_early(new_state, budget)
+    messages = _prompts(new_state).build(
+        "planner", [planner_system_prompt()], planner_prompt(user_prompt)
+    )
+    resp = invoke_structured(llm, Plan, messages, budget=budget)
     if resp is None:
         raise ValueError("Planner did not return a valid response.")
     new_state["plan"] = resp
+    if budget.check():
+        return _stop_early(new_state, budget)
     return new_state
 
 def architect_agent(state: AgentState) -> AgentState:
@@ -67,14 +92,21 @@ def architect_agent(state: AgentState) -> AgentState:
     plan: Plan = new_state.get("plan")
     if plan is None:
         raise ValueError("architect_agent expects 'plan' in state.")
-    resp = invoke_structured(
-        llm, TaskPlan, architect_prompt(plan=plan.model_dump_json(indent=2))
+    budget: Budget = (new_state.get("budget") or Budget()).start()
+    new_state["budget"] = budget
+    if budget.check():
+        return _stop_early(new_state, budget)
+    messages = _prompts(new_state).build(
+        "architect", [architect_system_prompt()], architect_prompt(plan=plan.model_dump_json(indent=2))
     )
+    resp = invoke_structured(llm, TaskPlan, messages, budget=budget)
     if resp is None:
         raise ValueError("Architect did not return a valid response.")
     resp.plan = plan  # type: ignore
     print("\n[Architect Output]\n", resp.model_dump_json(indent=2))
     new_state["task_plan"] = resp
+    if budget.check():
+        return _stop_early(new_state, budget)
     return new_state
 
 def coder_agent(state: AgentState) -> AgentState:
@@ -84,6 +116,11 @@ def coder_agent(state: AgentState) -> AgentState:
     # Get and clear the last error to prevent re-using it
     last_error = new_state.pop("last_error", None)
 
+    budget: Budget = (new_state.get("budget") or Budget()).start()
+    new_state["budget"] = budget
+    if budget.check():
+        return _stop_early(new_state, budget)
+
     # 1. Setup Coder State
     coder_state: Optional[CoderState] = new_state.get("coder_state")
     if coder_state is None:
@@ -106,36 +143,30 @@ def coder_agent(state: AgentState) -> AgentState:
     print(f"[Task Description]: {current_task.task_description}")
 
     try:
-        existing_content = read_file(current_task.filepath)
+        existing_content = read_project_file(current_task.filepath)
     except Exception:
         existing_content = "File not found or is empty."
 
-    # 2. Build Correction Prompt (if applicable)
-    error_correction_prompt = ""
-    if last_error:
-        print(f"\n[Coder RETRY]: Retrying step with error info: {last_error}")
-        error_correction_prompt = (
-            "Your previous attempt on this task failed. You must correct your action.\n"
-            f"ERROR: {last_error}\n"
-            "REMINDER: Review the available tools and their usage. "
-            "The *only* tools available are: `read_file`, `write_file`, `list_file`, `get_current_directory`, `run_cmd`.\n"
-            "Do not use prefixes like `repo_browser`.\n"
-            "--- Please try the task again ---\n\n"
-        )
+    # 2. Build Prompt: constant prefix (system prompt + plan), then the task and any correction
+    prefix = [coder_system_prompt(), tool_limits_prompt()]
+    if new_state.get("plan") is not None:
+        prefix.append(project_context_prompt(new_state["plan"].model_dump_json(indent=2)))
 
-    user_prompt = (
-        f"{error_correction_prompt}"
-        f"Task: {current_task.task_description}\n"
-        f"File: {current_task.filepath}\n"
-        f"Existing content:\n{existing_content}\n\n"
-        "Remember to use `write_file(path, content)` to save your *full* and *complete* changes."
+    user_prompt = coder_user_prompt(
+        task_description=current_task.task_description,
+        filepath=current_task.filepath,
+        existing_content=existing_content,
     )
+    if last_error:
+        print(f"\n[Coder RETRY]: Retrying step with error info: {last_error}")
+        user_prompt += coder_retry_prompt(last_error)
 
     # 3. Run Agent with Error Handling
     try:
         llm_response_dict = invoke_messages(
             coder_react_agent,
-            [SystemMessage(content=coder_system_prompt()), HumanMessage(content=user_prompt)]
+            _prompts(new_state).build("coder", prefix, user_prompt),
+            budget=budget,
         )
         
         # --- SUCCESS ---
@@ -158,6 +189,9 @@ def coder_agent(state: AgentState) -> AgentState:
         print(f"\n[Coder ERROR]: {error_str}")
 
         if "Tool call validation failed" in error_str or "Tool use failed" in error_str:
+            if budget.record_coder_retry(coder_state.current_step_idx):
+                new_state["coder_state"] = coder_state
+                return _stop_early(new_state, budget)
             # Persist the error for the next loop
             new_state["last_error"] = error_str
             new_state["status"] = "IN_PROGRESS"  # Loop back to coder
@@ -179,30 +213,29 @@ def debugger_agent(state: AgentState) -> AgentState:
     if "plan" not in new_state:
         raise ValueError("debugger_agent expects 'plan' in state.")
 
+    budget: Budget = (new_state.get("budget") or Budget()).start()
+    new_state["budget"] = budget
+    if budget.check():
+        return _stop_early(new_state, budget)
+
     plan_json = new_state["plan"].model_dump_json(indent=2)
     
-    # Build Correction Prompt
-    error_correction_prompt = ""
+    # Build Prompt: constant prefix (system prompt + plan), then instructions and any correction
+    debug_prompt = debugger_user_prompt()
     if last_error:
         print(f"\n[Debugger RETRY]: Retrying with error info: {last_error}")
-        error_correction_prompt = (
-            "Your previous attempt to debug failed. You must correct your action.\n"
-            f"ERROR: {last_error}\n"
-            "REMINDER: Review the available tools. The *only* tools available are: `read_file`, `list_file`, `get_current_directory`, `run_cmd`.\n"
-            "Do not use prefixes like `repo_browser`.\n"
-            "--- Please try to debug the project again ---\n\n"
-        )
-
-    debug_prompt = (
-        f"{error_correction_prompt}"
-        f"{debugger_user_prompt(original_plan=plan_json)}"
-    )
+        debug_prompt += debugger_retry_prompt(last_error)
 
     # Run Agent with Error Handling
     try:
         llm_response_dict = invoke_messages(
             debugger_react_agent,
-            [SystemMessage(content=debugger_system_prompt()), HumanMessage(content=debug_prompt)]
+            _prompts(new_state).build(
+                "debugger",
+                [debugger_system_prompt(), tool_limits_prompt(), project_context_prompt(plan_json)],
+                debug_prompt,
+            ),
+            budget=budget,
         )
         
         # --- SUCCESS ---
@@ -214,12 +247,16 @@ def debugger_agent(state: AgentState) -> AgentState:
             new_state["status"] = "APPROVED"
             return new_state
         else:
+            if budget.record_debug_cycle(bug_report):
+                return _stop_early(new_state, budget)
+
             print("\n[Debugger Status]: Bugs found. Generating fix plan...")
-            fix_prompt = debugger_fix_prompt(
-                bug_report=bug_report,
-                original_plan=plan_json
+            fix_prompt = _prompts(new_state).build(
+                "fixer",
+                [debugger_fix_system_prompt(), project_context_prompt(plan_json)],
+                debugger_fix_prompt(bug_report=bug_report),
             )
-            fix_plan = invoke_structured(llm, TaskPlan, fix_prompt)
+            fix_plan = invoke_structured(llm, TaskPlan, fix_prompt, budget=budget)
 
             print(f"\n[Debugger Fix Plan]:\n{fix_plan.model_dump_json(indent=2)}")
 
@@ -235,6 +272,8 @@ def debugger_agent(state: AgentState) -> AgentState:
         print(f"\n[Debugger ERROR]: {error_str}")
 
         if "Tool call validation failed" in error_str or "Tool use failed" in error_str:
+            if budget.record_debugger_error():
+                return _stop_early(new_state, budget)
             # Persist the error for the next loop
             new_state["last_error"] = error_str
             new_state["status"] = "DEBUGGER_ERROR"  # <-- NEW STATUS
@@ -254,22 +293,34 @@ graph.add_node("debugger", debugger_agent)
 
 graph.set_entry_point("planner")
 
-graph.add_edge("planner", "architect")
-graph.add_edge("architect", "coder")
+# Planner -> Architect -> Coder, unless the budget ran out ("BUDGET_EXCEEDED" ends the graph)
+graph.add_conditional_edges(
+    "planner",
+    lambda s: "END" if s.get("status") == "BUDGET_EXCEEDED" else "architect",
+    {"architect": "architect", "END": END}
+)
+graph.add_conditional_edges(
+    "architect",
+    lambda s: "END" if s.get("status") == "BUDGET_EXCEEDED" else "coder",
+    {"coder": "coder", "END": END}
+)
 
 # Coder loop:
 # - If status is "DONE", go to "debugger"
+# - If "BUDGET_EXCEEDED", end the graph with the partial result
 # - Otherwise (e.g., "IN_PROGRESS"), loop back to "coder"
 # This now handles both success (incremented index) and failure (same index + last_error)
 graph.add_conditional_edges(
     "coder",
-    lambda s: "debugger" if s.get("status") == "DONE" else "coder",
-    {"debugger": "debugger", "coder": "coder"}
+    lambda s: "debugger" if s.get("status") == "DONE"
+              else "END" if s.get("status") == "BUDGET_EXCEEDED"
+              else "coder",
+    {"debugger": "debugger", "coder": "coder", "END": END}
 )
 
 # Debugger loop:
 # - If "BUGS_FOUND", go to "coder" to fix them
-# - If "APPROVED", end the graph
+# - If "APPROVED" or "BUDGET_EXCEEDED", end the graph
 # - If "DEBUGGER_ERROR", loop back to "debugger" to retry
 graph.add_conditional_edges(
     "debugger",
@@ -290,4 +341,5 @@ if __name__ == "__main__":
         {"user_prompt": "Build a colourful modern todo app in html css and js"},
         {"recursion_limit": 100}
     )
-    print("\n✅ Final State:\n", result)
\ No newline at end of file
+    print("\n✅ Final State:\n", result)
+    print("\n[Prompt Cache]:\n", result["prompts"].report())
\ No newline at end of file
@@ -1,16 +1,26 @@
 # agent/prompt.py
 
-def planner_prompt(user_prompt: str) -> str:
-  PLANNER_PROMPT = f"""
+from .shaping import LIST_FILE_LIMIT, READ_FILE_LINE_LIMIT, TOOL_BYTE_CAPS
+
+# Prompts are split into a constant system prompt (the cacheable prefix) and a
+# user prompt holding only the per-call content (the variable suffix).
+# See agent/prompt_cache.py for how they are assembled.
+
+def planner_system_prompt() -> str:
+  PLANNER_SYSTEM_PROMPT = """
 You are the PLANNER agent. Convert the user prompt into a COMPLETE engineering project plan.
+  """
+  return PLANNER_SYSTEM_PROMPT
 
+def planner_prompt(user_prompt: str) -> str:
+  PLANNER_PROMPT = f"""
 User request:
 {user_prompt}
   """
   return PLANNER_PROMPT
 
-def architect_prompt(plan: str) -> str:
-  ARCHITECT_PROMPT = f"""
+def architect_system_prompt() -> str:
+  ARCHITECT_SYSTEM_PROMPT = """
 You are the ARCHITECT agent. Given this project plan, break it down into explicit engineering tasks.
 
 RULES:
@@ -23,27 +33,50 @@ RULES:
 - Order tasks so that dependencies are implemented first.
 - Each step must be SELF-CONTAINED but also carry FORWARD the relevant context from earlier tasks.
 
-Project Plan:
-{plan}
-
 ---
 IMPORTANT: You must respond *only* with the structured `TaskPlan`.
 The `TaskPlan` consists of a list of `implementation_steps`.
 Each step must have a `filepath` and a `task_description`.
 Do not add any other text, markdown, or explanation.
+  """
+  return ARCHITECT_SYSTEM_PROMPT
+
+def architect_prompt(plan: str) -> str:
+  ARCHITECT_PROMPT = f"""
+Project Plan:
+{plan}
   """
   return ARCHITECT_PROMPT
 
+def project_context_prompt(plan: str) -> str:
+  PROJECT_CONTEXT_PROMPT = f"""
+Project Plan (shared context for every task in this project):
+{plan}
+  """
+  return PROJECT_CONTEXT_PROMPT
+
+def tool_limits_prompt() -> str:
+  caps = "\n".join(f"- `{name}`: {cap} bytes" for name, cap in TOOL_BYTE_CAPS.items())
+  TOOL_LIMITS_PROMPT = f"""
+Tool output limits:
+Tool results are truncated to keep the conversation small. Truncated results end with a note in [brackets] saying how to get the rest.
+{caps}
+- `read_file` returns at most {READ_FILE_LINE_LIMIT} lines per call by default; page through long files with `offset`.
+- `list_file` returns at most {LIST_FILE_LIMIT} files per call by default; page with `offset`.
+- `run_cmd` keeps the start and end of long output and adds `error_lines` not already shown when a command fails.
+  """
+  return TOOL_LIMITS_PROMPT
+
 def coder_system_prompt() -> str:
-  CODER_SYSTEM_PROMPT = """
+  CODER_SYSTEM_PROMPT = f"""
 You are the CODER agent.
 You are implementing a specific engineering task.
 You have access to a *limited* set of tools. You MUST use the tools with their exact names.
 
 Available Tools (use these exact names ONLY - do NOT add any prefixes or namespaces):
 - `write_file(path: str, content: str)`: Writes content to a file at the specified path.
-- `read_file(path: str)`: Reads content from a file at the specified path.
-- `list_file(directory: str = ".")`: Lists files in a directory.
+- `read_file(path: str, offset: int = 0, limit: int = None)`: Reads lines `offset` to `offset + limit` of a file.
+- `list_file(directory: str = ".", offset: int = 0, limit: int = {LIST_FILE_LIMIT})`: Lists files in a directory (dependency folders like `node_modules` are skipped).
 - `get_current_directory()`: Returns the project root directory path.
 - `run_cmd(cmd: str, cwd: str = None, timeout: int = 30)`: Runs a shell command.
 
@@ -65,13 +98,34 @@ DO NOT call:
   """
   return CODER_SYSTEM_PROMPT
 
+def coder_user_prompt(task_description: str, filepath: str, existing_content: str) -> str:
+  CODER_USER_PROMPT = f"""
+Task: {task_description}
+File: {filepath}
+Existing content:
+{existing_content}
+
+Remember to use `write_file(path, content)` to save your *full* and *complete* changes.
+"""
+  return CODER_USER_PROMPT
+
+def coder_retry_prompt(last_error: str) -> str:
+  CODER_RETRY_PROMPT = f"""
+--- Your previous attempt on this task failed. You must correct your action. ---
+ERROR: {last_error}
+REMINDER: Review the available tools and their usage. The *only* tools available are: `read_file`, `write_file`, `list_file`, `get_current_directory`, `run_cmd`.
+Do not use prefixes like `repo_browser`.
+Please try the task again.
+"""
+  return CODER_RETRY_PROMPT
+
 def debugger_system_prompt() -> str:
-  DEBUGGER_SYSTEM_PROMPT = """
+  DEBUGGER_SYSTEM_PROMPT = f"""
 You are the DEBUGGER agent. Your job is to analyze the entire project for bugs and create a report.
 
 Available Tools:
-- `read_file(path: str)`: Reads content from a file.
-- `list_file(directory: str = ".")`: Lists all files in the project.
+- `read_file(path: str, offset: int = 0, limit: int = None)`: Reads lines `offset` to `offset + limit` of a file.
+- `list_file(directory: str = ".", offset: int = 0, limit: int = {LIST_FILE_LIMIT})`: Lists files in the project (dependency folders like `node_modules` are skipped).
 - `run_cmd(cmd: str, cwd: str = None, timeout: int = 30)`: Runs a shell command.
 
 Your process:
@@ -89,13 +143,10 @@ If you find bugs, respond with a detailed, multi-line bug report.
 """
   return DEBUGGER_SYSTEM_PROMPT
 
-def debugger_user_prompt(original_plan: str) -> str:
-  DEBUGGER_USER_PROMPT = f"""
+def debugger_user_prompt() -> str:
+  DEBUGGER_USER_PROMPT = """
 The CODER agent has just finished implementing the project.
-Please review all the files based on the original plan and look for bugs.
-
-Original Plan:
-{original_plan}
+Please review all the files based on the project plan and look for bugs.
 
 Review all files, analyze them for bugs, and provide your report.
 Remember:
@@ -104,22 +155,33 @@ Remember:
 """
   return DEBUGGER_USER_PROMPT
 
-def debugger_fix_prompt(bug_report: str, original_plan: str) -> str:
-  FIXER_PROMPT = f"""
+def debugger_retry_prompt(last_error: str) -> str:
+  DEBUGGER_RETRY_PROMPT = f"""
+--- Your previous attempt to debug failed. You must correct your action. ---
+ERROR: {last_error}
+REMINDER: Review the available tools. The *only* tools available are: `read_file`, `list_file`, `get_current_directory`, `run_cmd`.
+Do not use prefixes like `repo_browser`.
+Please try to debug the project again.
+"""
+  return DEBUGGER_RETRY_PROMPT
+
+def debugger_fix_system_prompt() -> str:
+  FIXER_SYSTEM_PROMPT = """
 You are the ARCHITECT. A "bug report" has been generated by the debugger.
 Your task is to convert this bug report into a new, actionable TaskPlan for the CODER agent.
 The new TaskPlan should only contain the steps necessary to *fix* the identified bugs.
 
-Original Project Plan (for context):
-{original_plan}
-
-Bug Report from Debugger:
-{bug_report}
-
 ---
 IMPORTANT: You must respond *only* with the structured `TaskPlan`.
 The `TaskPlan` consists of a list of `implementation_steps`.
 Each step must have a `filepath` and a `task_description` that clearly explains the fix.
 Do not add any other text, markdown, or explanation.
+"""
+  return FIXER_SYSTEM_PROMPT
+
+def debugger_fix_prompt(bug_report: str) -> str:
+  FIXER_PROMPT = f"""
+Bug Report from Debugger:
+{bug_report}
 """
   return FIXER_PROMPT
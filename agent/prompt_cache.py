@@ -0,0 +1,70 @@
+# agent/prompt_cache.py
+
+import hashlib
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from pydantic import BaseModel, Field
+
+
+class PrefixStats(BaseModel):
+  calls: int = Field(0, description="Number of prompts assembled")
+  hits: int = Field(0, description="Prompts whose prefix had already been sent before")
+  prefix_chars: int = Field(0, description="Total characters in prompt prefixes")
+  hit_chars: int = Field(0, description="Prefix characters that were a repeat of an earlier prompt")
+  total_chars: int = Field(0, description="Total characters in prefixes and suffixes")
+  distinct_prefixes: int = Field(0, description="Number of different prefixes seen")
+
+  @property
+  def hit_ratio(self) -> float:
+    return self.hits / self.calls if self.calls else 0.0
+
+  @property
+  def cached_chars_ratio(self) -> float:
+    return self.hit_chars / self.total_chars if self.total_chars else 0.0
+
+
+class PromptAssembler:
+  """
+  Builds LLM messages as a stable prefix (system prompt, tool specs, plan JSON)
+  followed by a variable suffix, so providers with automatic prefix caching can
+  reuse everything up to the per-call content. Keeps per-prompt hit statistics;
+  one instance lives in the graph state per run, so hits are counted per run.
+  """
+
+  def __init__(self):
+    self._seen: set[str] = set()
+    self._stats: dict[str, PrefixStats] = {}
+
+  def build(self, name: str, prefix: list[str], suffix: str) -> list:
+    """Returns [SystemMessage(prefix), HumanMessage(suffix)] and records prefix reuse."""
+    if not prefix or not all(part and part.strip() for part in prefix):
+      raise ValueError(f"Prompt '{name}' needs a non-empty constant prefix.")
+    system = "\n\n".join(part.strip() for part in prefix)
+    user = suffix.strip()
+    self._record(name, system, user)
+    return [SystemMessage(content=system), HumanMessage(content=user)]
+
+  def _record(self, name: str, system: str, user: str) -> None:
+    key = hashlib.sha256(f"{name}\0{system}".encode("utf-8")).hexdigest()
+    stats = self._stats.setdefault(name, PrefixStats())
+    stats.calls += 1
+    stats.prefix_chars += len(system)
+    stats.total_chars += len(system) + len(user)
+    if key in self._seen:
+      stats.hits += 1
+      stats.hit_chars += len(system)
+    else:
+      self._seen.add(key)
+      stats.distinct_prefixes += 1
+
+  def stats(self) -> dict[str, PrefixStats]:
+    return dict(self._stats)
+
+  def report(self) -> str:
+    lines = [
+      f"{name}: {s.hits}/{s.calls} prefix hits ({s.hit_ratio:.0%}), "
+      f"{s.cached_chars_ratio:.0%} of prompt chars reusable, {s.distinct_prefixes} distinct prefixes"
+      for name, s in self.stats().items()
+    ]
+    return "\n".join(lines) if lines else "No prompts assembled yet."
+
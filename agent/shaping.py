@@ -0,0 +1,133 @@
+# agent/shaping.py
+
+import json
+import re
+
+# Maximum bytes of each tool's result that is fed back into the ReAct message history.
+TOOL_BYTE_CAPS = {
+  "read_file": 24_000,
+  "list_file": 8_000,
+  "run_cmd": 8_000,
+}
+
+# Bytes of each cap kept free for the paging / truncation notes appended to a result.
+NOTE_RESERVE = 512
+
+# Default page sizes for ranged reads and listings.
+READ_FILE_LINE_LIMIT = 400
+LIST_FILE_LIMIT = 200
+
+# Longest single error line returned by run_cmd.
+ERROR_LINE_MAX_BYTES = 300
+
+# Lines in command output that usually explain a failure.
+ERROR_LINE_PATTERN = re.compile(
+  r"error|exception|traceback|failed|failure|fatal|cannot|not found|undefined|ERR!",
+  re.IGNORECASE,
+)
+
+
+def byte_len(text: str) -> int:
+  return len(text.encode("utf-8"))
+
+
+def cut_bytes(text: str, n: int, from_end: bool = False) -> str:
+  if n <= 0:
+    return ""
+  data = text.encode("utf-8")
+  data = data[-n:] if from_end else data[:n]
+  return data.decode("utf-8", errors="ignore")
+
+
+def fit_to_cap(items: list[str], cap: int) -> tuple[list[str], bool]:
+  """
+  Returns the leading whole items whose combined size fits in `cap` bytes.
+  If the first item alone is larger than `cap`, it is cut to `cap` bytes and
+  the second return value is True.
+  """
+  kept = []
+  used = 0
+  for item in items:
+    size = byte_len(item)
+    if used + size > cap:
+      if not kept:
+        return [cut_bytes(item, cap)], True
+      break
+    kept.append(item)
+    used += size
+  return kept, False
+
+
+def head_tail(text: str, cap: int) -> str:
+  """Keeps the start and (larger) end of long output, where commands usually report errors."""
+  size = byte_len(text)
+  if size <= cap:
+    return text
+  head = cap // 4
+  tail = cap - head
+  omitted = size - head - tail
+  return (
+    cut_bytes(text, head)
+    + f"\n[... {omitted} bytes omitted ...]\n"
+    + cut_bytes(text, tail, from_end=True)
+  )
+
+
+def extract_error_lines(text: str, max_lines: int = 20) -> list[str]:
+  """Returns the last `max_lines` lines that look like errors, without duplicates."""
+  seen = set()
+  lines = []
+  for line in text.splitlines():
+    line = line.strip()
+    if line and line not in seen and ERROR_LINE_PATTERN.search(line):
+      seen.add(line)
+      lines.append(line)
+  return lines[-max_lines:]
+
+
+def _shape_streams(returncode: int, stdout: str, stderr: str, errors: list[str],
+                   stream_budget: int, error_budget: int) -> dict:
+  # Split the stream budget evenly, letting a short stream donate its unused share
+  half = stream_budget // 2
+  out_cap = min(byte_len(stdout), max(half, stream_budget - byte_len(stderr)))
+  err_cap = max(stream_budget - out_cap, 0)
+  shaped_out = head_tail(stdout, out_cap)
+  shaped_err = head_tail(stderr, err_cap)
+  result = {
+    "returncode": returncode,
+    "stdout": shaped_out,
+    "stderr": shaped_err,
+  }
+  if shaped_out != stdout or shaped_err != stderr:
+    result["note"] = (
+      f"Output truncated to fit {TOOL_BYTE_CAPS['run_cmd']} bytes "
+      f"(stdout was {byte_len(stdout)} bytes, stderr {byte_len(stderr)} bytes)."
+    )
+  # Only error lines the model cannot already see in the kept output
+  visible = shaped_out + "\n" + shaped_err
+  hidden = [cut_bytes(line, ERROR_LINE_MAX_BYTES) for line in errors if line not in visible]
+  error_lines, _ = fit_to_cap(hidden, error_budget)
+  if error_lines:
+    result["error_lines"] = error_lines
+  return result
+
+
+def shape_cmd_result(returncode: int, stdout: str, stderr: str) -> dict:
+  """Builds the run_cmd result dict, keeping its JSON encoding within TOOL_BYTE_CAPS["run_cmd"]."""
+  cap = TOOL_BYTE_CAPS["run_cmd"]
+  overflow = byte_len(stdout) + byte_len(stderr) > cap - NOTE_RESERVE
+  errors = extract_error_lines(stderr + "\n" + stdout) if returncode != 0 or overflow else []
+  error_budget = cap // 4 if errors else 0
+  stream_budget = cap - error_budget - NOTE_RESERVE
+  while True:
+    result = _shape_streams(returncode, stdout, stderr, errors, stream_budget, error_budget)
+    size = byte_len(json.dumps(result, ensure_ascii=False))
+    if size <= cap:
+      return result
+    # JSON escaping and markers cost more than estimated; shrink and try again
+    if stream_budget > 0:
+      stream_budget = max(stream_budget - (size - cap), 0)
+    elif error_budget > 0:
+      error_budget = max(error_budget - (size - cap), 0)
+    else:
+      return result
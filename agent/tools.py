@@ -1,13 +1,26 @@
 # agent/tools.py
 
+import os
 import pathlib
 import subprocess
-from typing import Tuple
+from typing import Optional, Tuple
 
 from langchain_core.tools import tool
 
+from .shaping import (
+  LIST_FILE_LIMIT,
+  NOTE_RESERVE,
+  READ_FILE_LINE_LIMIT,
+  TOOL_BYTE_CAPS,
+  fit_to_cap,
+  shape_cmd_result,
+)
+
 PROJECT_ROOT = pathlib.Path.cwd() / "generated_project"
 
+# Dependency and cache directories; never listed or walked.
+IGNORED_DIRS = {"node_modules", ".git", "__pycache__", ".venv", "venv", ".cache"}
+
 
 def safe_path_for_project(path: str) -> pathlib.Path:
   p = (PROJECT_ROOT / path).resolve()
@@ -21,6 +34,29 @@ def safe_path_for_project(path: str) -> pathlib.Path:
   return p
 
 
+def iter_project_files(base: pathlib.Path, skipped: Optional[list] = None):
+  """Yields files under base, sorted, without descending into IGNORED_DIRS."""
+  for dirpath, dirnames, filenames in os.walk(base):
+    kept = []
+    for d in sorted(dirnames):
+      if d in IGNORED_DIRS:
+        if skipped is not None:
+          skipped.append(str((pathlib.Path(dirpath) / d).relative_to(PROJECT_ROOT)))
+      else:
+        kept.append(d)
+    dirnames[:] = kept
+    for name in sorted(filenames):
+      yield pathlib.Path(dirpath) / name
+
+
+def read_project_file(path: str) -> str:
+  """Returns the full content of a project file, or "" if it does not exist."""
+  p = safe_path_for_project(path)
+  if not p.exists():
+    return ""
+  with open(p, "r", encoding="utf-8") as f:
+    return f.read()
+
 
 @tool(name_or_callable="write_file")
 def write_file(path: str, content: str) -> str:
@@ -33,13 +69,32 @@ def write_file(path: str, content: str) -> str:
 
 
 @tool(name_or_callable="read_file")
-def read_file(path: str) -> str:
-  """Reads content from a file at the specified path within the project root."""
+def read_file(path: str, offset: int = 0, limit: Optional[int] = None) -> str:
+  """Reads up to `limit` lines starting at line `offset` (0-based) from a file within the project root."""
   p = safe_path_for_project(path)
   if not p.exists():
     return ""
+  offset = max(offset, 0)
+  limit = READ_FILE_LINE_LIMIT if limit is None else max(limit, 1)
+  page = []
+  total = 0
   with open(p, "r", encoding="utf-8") as f:
-    return f.read()
+    for i, line in enumerate(f):
+      if offset <= i < offset + limit:
+        page.append(line)
+      total = i + 1
+  if offset > 0 and offset >= total:
+    return f"[read_file: offset {offset} is past the end of {path} ({total} lines).]"
+  cap = TOOL_BYTE_CAPS["read_file"] - NOTE_RESERVE
+  lines, line_cut = fit_to_cap(page, cap)
+  content = "".join(lines)
+  end = offset + len(lines)
+  if line_cut:
+    content += f"\n[read_file: line {offset + 1} is longer than {cap} bytes; only its first {cap} bytes are shown.]"
+  if offset > 0 or end < total:
+    content += f"\n[read_file: lines {offset + 1}-{end} of {total}."
+    content += f" Call read_file(\"{path}\", offset={end}) for more.]" if end < total else "]"
+  return content
 
 
 @tool(name_or_callable="get_current_directory")
@@ -49,24 +104,39 @@ def get_current_directory() -> str:
 
 
 @tool(name_or_callable="list_file")
-def list_file(directory: str = ".") -> str:
-  """Lists all files in the specified directory within the project root."""
+def list_file(directory: str = ".", offset: int = 0, limit: int = LIST_FILE_LIMIT) -> str:
+  """Lists up to `limit` files starting at `offset` in the specified directory within the project root, skipping dependency folders like node_modules."""
   p = safe_path_for_project(directory)
   if not p.is_dir():
     return f"ERROR: {p} is not a directory"
-  files = [str(f.relative_to(PROJECT_ROOT)) for f in p.glob("**/*") if f.is_file()]
-  return "\n".join(files) if files else "No files found."
+  skipped = []
+  files = [str(f.relative_to(PROJECT_ROOT)) for f in iter_project_files(p, skipped)]
+  if not files:
+    return "No files found."
+  offset = max(offset, 0)
+  if offset >= len(files):
+    return f"[list_file: offset {offset} is past the end of {directory} ({len(files)} files).]"
+  page = [f + "\n" for f in files[offset:offset + max(limit, 1)]]
+  cap = TOOL_BYTE_CAPS["list_file"] - NOTE_RESERVE
+  entries, entry_cut = fit_to_cap(page, cap)
+  out = "".join(entries).rstrip("\n")
+  end = offset + len(entries)
+  if entry_cut:
+    out += f"\n[list_file: entry {offset + 1} is longer than {cap} bytes and was cut.]"
+  if offset > 0 or end < len(files):
+    out += f"\n[list_file: files {offset + 1}-{end} of {len(files)}."
+    out += f" Call list_file(\"{directory}\", offset={end}) for more.]" if end < len(files) else "]"
+  if skipped:
+    shown = ", ".join(skipped[:10]) + (f" and {len(skipped) - 10} more" if len(skipped) > 10 else "")
+    out += f"\n[Skipped dependency folders: {shown}]"
+  return out
 
 @tool(name_or_callable="run_cmd")
 def run_cmd(cmd: str, cwd: str = None, timeout: int = 30) -> dict:
-  """Runs a shell command in the specified directory and returns the result as a dict."""
+  """Runs a shell command in the specified directory and returns the result as a dict. Long output is truncated and error lines are extracted."""
   cwd_dir = safe_path_for_project(cwd) if cwd else PROJECT_ROOT
   res = subprocess.run(cmd, shell=True, cwd=str(cwd_dir), capture_output=True, text=True, timeout=timeout)
-  return {
-    "returncode": res.returncode,
-    "stdout": res.stdout,
-    "stderr": res.stderr
-  }
+  return shape_cmd_result(res.returncode, res.stdout, res.stderr)
 
 
 
@@ -3,6 +3,8 @@
 from tenacity import retry, stop_after_attempt, wait_random_exponential, retry_if_exception_type
 from langchain_core.exceptions import OutputParserException
 
+from .budget import BudgetCallbackHandler
+
 def _retry_kwargs():
   return dict(
     stop=stop_after_attempt(3),
@@ -18,10 +20,14 @@ def _retry_kwargs():
 def _with_retry(func):
   return retry(**_retry_kwargs())(func)
 
+def _budget_config(budget):
+  # Usage is counted per LLM call, so failed and retried attempts are charged too
+  return {"callbacks": [BudgetCallbackHandler(budget)]} if budget is not None else None
+
 @_with_retry
-def invoke_structured(llm, schema, prompt: str):
-  return llm.with_structured_output(schema).invoke(prompt)
+def invoke_structured(llm, schema, prompt, budget=None):
+  return llm.with_structured_output(schema).invoke(prompt, config=_budget_config(budget))
 
 @_with_retry
-def invoke_messages(agent, messages: list):
-  return agent.invoke({"messages": messages})
+def invoke_messages(agent, messages: list, budget=None):
+  return agent.invoke({"messages": messages}, config=_budget_config(budget))
@@ -3,29 +3,107 @@
 import pathlib
 import shutil
 import tempfile
-from typing import Any, Dict
+import threading
+import time
+from typing import Any, Dict, Optional
 
 import streamlit as st
 
-from agent.graph import agent, init_project_root
+from agent.budget import Budget, BudgetLimits
+from agent.tools import iter_project_files
 
 PROJECT_ROOT = pathlib.Path.cwd() / "generated_project"
 
 
-def list_files(base: pathlib.Path) -> list[pathlib.Path]:
-  if not base.exists():
+@st.cache_resource
+def load_agent():
+  """Import and compile the agent graph and create the project root once per server process."""
+  from agent.graph import agent, init_project_root
+  init_project_root()
+  return agent
+
+
+def project_signature(root: pathlib.Path) -> tuple[int, int, int]:
+  """(file count, newest mtime, total size) of the project; changes whenever files are added, removed or rewritten."""
+  if not root.exists():
+    return (0, 0, 0)
+  count = newest = total = 0
+  for p in iter_project_files(root):
+    stat = p.stat()
+    count += 1
+    newest = max(newest, stat.st_mtime_ns)
+    total += stat.st_size
+  return (count, newest, total)
+
+
+@st.cache_data(max_entries=256)
+def list_files(base: str, signature: tuple[int, int, int]) -> list[tuple[str, int]]:
+  """Returns (relative path, size) for project files; `signature` busts the cache when files change."""
+  root = pathlib.Path(base)
+  if not root.exists():
     return []
-  return [p for p in base.rglob("*") if p.is_file()]
+  return [(str(p.relative_to(root)), p.stat().st_size) for p in iter_project_files(root)]
+
+
+@st.cache_data(max_entries=256)
+def read_text(path: str, mtime: float) -> Optional[str]:
+  """Reads a project file; `mtime` busts the cache when the file is rewritten."""
+  try:
+    return pathlib.Path(path).read_text(encoding="utf-8")
+  except Exception:
+    return None
+
+
+class RunJob:
+  """An agent run executing in a background thread, kept in st.session_state across reruns."""
+
+  def __init__(self, agent, inputs: Dict[str, Any], config: Dict[str, Any]):
+    self.started_at = time.monotonic()
+    self.finished_at: Optional[float] = None
+    self.result: Optional[Dict[str, Any]] = None
+    self.error: Optional[str] = None
+    self._thread = threading.Thread(target=self._run, args=(agent, inputs, config), daemon=True)
+    self._thread.start()
+
+  def _run(self, agent, inputs, config):
+    try:
+      self.result = agent.invoke(inputs, config)
+    except Exception as e:
+      self.error = str(e)
+    finally:
+      self.finished_at = time.monotonic()
+
+  @property
+  def running(self) -> bool:
+    return self.finished_at is None
+
+  @property
+  def elapsed_s(self) -> float:
+    return (self.finished_at or time.monotonic()) - self.started_at
 
 
 st.set_page_config(page_title="Code Genesis", layout="wide")
 st.title("Code Genesis: Let the Agents Build Your Code 🧑🏻‍💻")
 
+st.session_state.setdefault("job", None)
+
+agent = load_agent()
+job: Optional[RunJob] = st.session_state["job"]
+
 with st.sidebar:
   st.header("⚙️ Settings")
   recursion_limit = st.number_input(
     "Recursion limit", min_value=10, max_value=500, value=100, step=10
   )
+  max_wall_time = st.number_input(
+    "Max wall time (s)", min_value=60, max_value=7200, value=900, step=60
+  )
+  max_tokens = st.number_input(
+    "Max tokens", min_value=10_000, max_value=5_000_000, value=500_000, step=50_000
+  )
+  max_cost = st.number_input(
+    "Max cost (USD, 0 = no limit)", min_value=0.0, max_value=100.0, value=0.0, step=0.5
+  )
   clear_before_run = st.checkbox(
     "Clear generated_project before run", value=False,
     help="Deletes the existing generated_project folder before execution."
@@ -42,13 +120,9 @@ user_prompt = st.text_area(
 )
 
 col_run, col_refresh = st.columns([1,1])
-run_clicked = col_run.button("🚀 Run Planner")
-refresh_clicked = col_refresh.button("🔄 Refresh File List")
-
-status_placeholder = st.empty()
-
-# Initialize project root on app start
-init_project_root()
+run_clicked = col_run.button("🚀 Run Planner", disabled=job is not None and job.running)
+# Clicking reruns the script, which re-reads the project signature
+col_refresh.button("🔄 Refresh File List")
 
 # -- ZIP download helper --
 def make_project_zip(path: pathlib.Path) -> bytes:
@@ -62,57 +136,94 @@ def make_project_zip(path: pathlib.Path) -> bytes:
       data = f.read()
   return data
 
-# -- Run agent --
+# -- Start agent run in the background --
 if run_clicked and user_prompt.strip():
   if clear_before_run and PROJECT_ROOT.exists():
     shutil.rmtree(PROJECT_ROOT)
-    init_project_root()
+    PROJECT_ROOT.mkdir(parents=True, exist_ok=True)
+
+  job = RunJob(
+    agent,
+    {"user_prompt": user_prompt, "budget": Budget(limits=BudgetLimits(
+      max_wall_time_s=float(max_wall_time),
+      max_tokens=int(max_tokens),
+      max_cost_usd=float(max_cost) or None,
+    ))},
+    {"recursion_limit": int(recursion_limit)},
+  )
+  st.session_state["job"] = job
+  st.rerun()
 
-  status_placeholder.info("Running agent… this can take a minute depending on your LLMs.")
+# -- Run status --
+def render_run_status(job: RunJob):
+  if job.running:
+    st.info(f"Running agent… {job.elapsed_s:.0f}s elapsed. This can take a minute depending on your LLMs.")
+  elif job.error:
+    st.error(f"Error: {job.error}")
+  elif job.result and job.result.get("status") == "BUDGET_EXCEEDED":
+    st.warning(f"Stopped early with a partial result: {job.result.get('last_output')}")
+  else:
+    st.success(f"Done ✅ ({job.elapsed_s:.0f}s)")
+
+# Polls only while a run is in progress, without re-running the whole script
+@st.fragment(run_every=2)
+def poll_run_status():
+  job: RunJob = st.session_state["job"]
+  if not job.running:
+    # The run finished: re-run the app once to show its results and files
+    st.rerun(scope="app")
+  render_run_status(job)
+
+if job is not None:
+  if job.running:
+    poll_run_status()
+  else:
+    render_run_status(job)
+
+# -- Results of the last run (kept across reruns) --
+if job is not None and not job.running and job.result:
+  result: Dict[str, Any] = job.result
+
+  st.subheader("Final State")
+  st.json(result)
+
+  # Convenience views if present in state
+  plan = result.get("plan")
+  task_plan = result.get("task_plan")
+  last_output = result.get("last_output")
+  status = result.get("status")
+
+  if status:
+    st.info(f"Status: {status}")
+
+  with st.expander("📝 Plan", expanded=False):
+    if plan:
+      st.json(plan)
+    else:
+      st.write("No plan found.")
 
-  try:
-    result: Dict[str, Any] = agent.invoke(
-      {"user_prompt": user_prompt},
-      {"recursion_limit": int(recursion_limit)}
-    )
-    status_placeholder.success("Done ✅")
-
-    st.subheader("Final State")
-    st.json(result)
-
-    # Convenience views if present in state
-    plan = result.get("plan")
-    task_plan = result.get("task_plan")
-    last_output = result.get("last_output")
-    status = result.get("status")
-
-    if status:
-      st.info(f"Status: {status}")
-
-    with st.expander("📝 Plan", expanded=False):
-      if plan:
-        st.json(plan)
-      else:
-        st.write("No plan found.")
-
-    with st.expander("🧱 Task Plan", expanded=False):
-      if task_plan:
-        st.json(task_plan)
-      else:
-        st.write("No task plan found.")
-
-    with st.expander("📤 Last Output (e.g., coder/debugger)", expanded=False):
-      if last_output:
-        st.code(str(last_output))
-      else:
-        st.write("No last output yet.")
-
-  except Exception as e:
-    status_placeholder.error(f"Error: {e}")
+  with st.expander("🧱 Task Plan", expanded=False):
+    if task_plan:
+      st.json(task_plan)
+    else:
+      st.write("No task plan found.")
+
+  with st.expander("📤 Last Output (e.g., coder/debugger)", expanded=False):
+    if last_output:
+      st.code(str(last_output))
+    else:
+      st.write("No last output yet.")
+
+  with st.expander("♻️ Prompt Cache", expanded=False):
+    prompts = result.get("prompts")
+    if prompts is not None:
+      st.code(prompts.report())
+    else:
+      st.write("No prompts assembled.")
 
 # File browser + download
 st.subheader("📁 generated_project contents")
-files = list_files(PROJECT_ROOT)
+files = list_files(str(PROJECT_ROOT), project_signature(PROJECT_ROOT))
 
 col_zip, col_empty = st.columns([1,3])
 with col_zip:
@@ -132,33 +243,32 @@ if not files:
   st.caption("No files yet. Run the planner to generate your project.")
 else:
   st.write(f"{len(files)} files found.")
-  for p in sorted(files):
-    rel = p.relative_to(PROJECT_ROOT)
-    with st.expander(str(rel), expanded=False):
+  for rel, size in files:
+    p = PROJECT_ROOT / rel
+    with st.expander(rel, expanded=False):
       try:
-        text = p.read_text(encoding="utf-8")
-        st.write(f"Size: {p.stat().st_size} bytes")
-
-        # Buttons: view, copy (show textarea), download single file
-        btn_col1, btn_col2, btn_col3 = st.columns([1,1,1])
-        view = btn_col1.button("View", key=f"view-{rel}")
-        copy = btn_col2.button("Copy (open in editor)", key=f"copy-{rel}")
-        dl = btn_col3.download_button(
-          label="Download",
-          data=text.encode('utf-8'),
-          file_name=str(rel.name),
-          mime="text/plain",
-        )
-
-        if view:
-          st.code(text)
-
-        if copy:
-          st.text_area(f"Copy content: {rel}", value=text, height=400)
-
-      except Exception:
+        text = read_text(str(p), p.stat().st_mtime)
+      except OSError:
+        text = None
+      if text is None:
         st.write("(Binary or unreadable file)")
+        continue
+      st.write(f"Size: {size} bytes")
+
+      # Buttons: view, copy (show textarea), download single file
+      btn_col1, btn_col2, btn_col3 = st.columns([1,1,1])
+      view = btn_col1.button("View", key=f"view-{rel}")
+      copy = btn_col2.button("Copy (open in editor)", key=f"copy-{rel}")
+      dl = btn_col3.download_button(
+        label="Download",
+        data=text.encode('utf-8'),
+        file_name=pathlib.Path(rel).name,
+        mime="text/plain",
+        key=f"dl-{rel}",
+      )
 
-# Manual refresh control
-if refresh_clicked:
-  st.rerun()
+      if view:
+        st.code(text)
+
+      if copy:
+        st.text_area(f"Copy content: {rel}", value=text, height=400)
@@ -4,6 +4,7 @@ import argparse
 import sys
 import traceback
 
+from agent.budget import Budget, BudgetLimits
 from agent.graph import agent
 
 
@@ -11,16 +12,28 @@ def main():
     parser = argparse.ArgumentParser(description="Run engineering project planner")
     parser.add_argument("--recursion-limit", "-r", type=int, default=100,
                         help="Recursion limit for processing (default: 100)")
+    parser.add_argument("--max-wall-time", type=float, default=900,
+                        help="Stop the run after this many seconds (default: 900)")
+    parser.add_argument("--max-tokens", type=int, default=500_000,
+                        help="Stop the run after this many LLM tokens (default: 500000)")
+    parser.add_argument("--max-cost", type=float, default=None,
+                        help="Stop the run after this estimated cost in USD (default: no limit)")
 
     args = parser.parse_args()
 
     try:
         user_prompt = input("Enter your project prompt: ")
         result = agent.invoke(
-            {"user_prompt": user_prompt},
+            {"user_prompt": user_prompt, "budget": Budget(limits=BudgetLimits(
+                max_wall_time_s=args.max_wall_time,
+                max_tokens=args.max_tokens,
+                max_cost_usd=args.max_cost,
+            ))},
             {"recursion_limit": args.recursion_limit}
         )
         print("Final State:", result)
+        if result.get("prompts") is not None:
+            print("Prompt cache:", result["prompts"].report(), sep="\n")
     except KeyboardInterrupt:
         print("\nOperation cancelled by user.")
         sys.exit(0)